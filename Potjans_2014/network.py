@@ -28,10 +28,50 @@ build and simulate the network.
 """
 
 import os
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import nest
 import helpers
 
+# nest.version() was replaced by nest.__version__ in NEST 3
+NEST_VERSION = '2' if hasattr(nest, 'version') else '3'
+
+# bounds further away from the mean than this many standard deviations are
+# exceeded with a probability below 1e-15 per draw
+REDRAW_NUM_STD = 8.
+
+
+def _normal_clipped(mean, std, low, high):
+    """ Creates a NEST parameter drawing from a clipped normal distribution.
+
+    Values outside of ``[low, high]`` are redrawn, as for the
+    ``normal_clipped`` distribution of NEST 2. If both bounds are further away
+    from the mean than ``REDRAW_NUM_STD`` standard deviations, the rejection
+    step is omitted.
+
+    Parameters
+    ----------
+    mean
+        Mean of the normal distribution.
+    std
+        Standard deviation of the normal distribution.
+    low
+        Lower bound.
+    high
+        Upper bound.
+
+    Returns
+    -------
+    param
+        NEST parameter.
+
+    """
+    normal = nest.random.normal(mean=mean, std=std)
+    if (low <= mean - REDRAW_NUM_STD * std and
+            high >= mean + REDRAW_NUM_STD * std):
+        return normal
+    return nest.math.redraw(normal, min=low, max=high)
+
 
 class Network:
     """ Provides functions to setup NEST, to create and connect all nodes of
@@ -58,10 +98,17 @@ class Network:
         self.sim_dict = sim_dict
         self.net_dict = net_dict
         self.stim_dict = stim_dict
+        self.rank = nest.Rank()
+        self.prepared = False
 
         # data directory
         self.data_path = sim_dict['data_path']
-        if nest.Rank() == 0:
+        self.spike_recorder_label = os.path.join(self.data_path,
+                                                 'spike_recorder')
+        self.voltmeter_label = os.path.join(self.data_path, 'voltmeter')
+        self.nodeids_file = os.path.join(self.data_path,
+                                         'population_nodeids.dat')
+        if self.rank == 0:
             if os.path.isdir(self.data_path):
                 message = '  Directory already existed.'
                 if self.sim_dict['overwrite_files']:
@@ -75,13 +122,7 @@ class Network:
         # derive parameters based on input dictionaries
         self.__derive_parameters()
 
-        # check NEST version
-        try:
-            nest.version()
-            self.nest_version = '2'
-        except BaseException:
-            nest.__version__
-            self.nest_version = '3'
+        self.nest_version = NEST_VERSION
         print(f'NEST version: {self.nest_version}')
 
         # initialize the NEST kernel
@@ -100,7 +141,7 @@ class Network:
             self.__create_poisson_bg_input()
         if self.stim_dict['thalamic_input']:
             self.__create_thalamic_stim_input()
-        if self.stim_dict['dc_input']:
+        if self.use_dc_input:
             self.__create_dc_stim_input()
 
     def connect(self):
@@ -130,10 +171,11 @@ class Network:
             self.__connect_poisson_bg_input()
         if self.stim_dict['thalamic_input']:
             self.__connect_thalamic_stim_input()
-        if self.stim_dict['dc_input']:
+        if self.use_dc_input:
             self.__connect_dc_stim_input()
 
         nest.Prepare()
+        self.prepared = True
 
     def simulate(self, t_sim):
         """ Simulates the microcircuit.
@@ -149,19 +191,21 @@ class Network:
             Simulation time (in ms).
 
         """
-        if nest.Rank() == 0:
+        if self.rank == 0:
             print('Simulating {} ms.'.format(t_sim))
 
-        try:
+        if self.prepared:
+            if self.rank == 0:
+                print(
+                    'nest.Prepare() has already been called after connecting '
+                    'the network. '
+                    'This simulate() call directly starts with nest.Run().')
+        else:
             nest.Prepare()
-        except BaseException:
-            print(
-                'nest.Prepare() has already been called after connecting the '
-                'network. '
-                'This simulate() call directly starts with nest.Run().')
 
         nest.Run(t_sim)
         nest.Cleanup()
+        self.prepared = False
 
     def get_local_spike_counter(self):
         """ Return number of local spikes """
@@ -196,21 +240,30 @@ class Network:
             None
 
         """
-        if nest.Rank() == 0:
-            print('Interval to plot spikes: {} ms'.format(raster_plot_interval))
+        if self.rank != 0:
+            return
+
+        print('Interval to plot spikes: {} ms'.format(raster_plot_interval))
+        print('Interval to compute firing rates: {} ms'.format(
+            firing_rates_interval))
+
+        # the firing rates only need NumPy and file I/O and are computed in
+        # the background while the raster plot is drawn; pyplot is used on
+        # the main thread only
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            rates = executor.submit(
+                helpers.firing_rates,
+                self.data_path, 'spike_recorder',
+                firing_rates_interval[0], firing_rates_interval[1])
             helpers.plot_raster(
                 self.data_path,
                 'spike_recorder',
                 raster_plot_interval[0],
                 raster_plot_interval[1],
                 self.net_dict['N_scaling'])
-
-            print('Interval to compute firing rates: {} ms'.format(
-                firing_rates_interval))
-            helpers.firing_rates(
-                self.data_path, 'spike_recorder',
-                firing_rates_interval[0], firing_rates_interval[1])
-            helpers.boxplot(self.data_path, self.net_dict['populations'])
+            # the box plot reads the rate files written by firing_rates
+            rates.result()
+        helpers.boxplot(self.data_path, self.net_dict['populations'])
 
     def __derive_parameters(self):
         """
@@ -233,6 +286,10 @@ class Network:
         self.ext_indegrees = np.round((self.net_dict['K_ext'] *
                                        self.net_dict['K_scaling'])).astype(int)
 
+        # flat (target, source, number) triplets of the recurrent connections
+        self.syn_i, self.syn_j = np.nonzero(self.num_synapses >= 0)
+        self.syn_N = self.num_synapses[self.syn_i, self.syn_j]
+
         # conversion from PSPs to PSCs
         PSC_over_PSP = helpers.postsynaptic_potential_to_current(
             self.net_dict['neuron_params']['C_m'],
@@ -245,7 +302,7 @@ class Network:
         if self.net_dict['poisson_input']:
             DC_amp = np.zeros(self.num_pops)
         else:
-            if nest.Rank() == 0:
+            if self.rank == 0:
                 print('DC input compensates for missing Poisson input.\n')
             DC_amp = helpers.dc_input_compensating_poisson(
                 self.net_dict['bg_rate'], self.net_dict['K_ext'],
@@ -267,8 +324,13 @@ class Network:
 
         # store final parameters as class attributes
         self.weight_matrix_mean = PSC_matrix_mean
+        self.weight_matrix_std = np.abs(
+            PSC_matrix_mean * self.net_dict['weight_rel_std'])
         self.weight_ext = PSC_ext
         self.DC_amp = DC_amp
+        self.delay_matrix_mean = np.asarray(self.net_dict['delay_matrix_mean'])
+        self.delay_matrix_std = \
+            self.delay_matrix_mean * self.net_dict['delay_rel_std']
 
         # thalamic input
         if self.stim_dict['thalamic_input']:
@@ -282,7 +344,12 @@ class Network:
                 self.weight_th /= np.sqrt(self.net_dict['K_scaling'])
             self.num_th_synapses = np.round(num_th_synapses).astype(int)
 
-        if nest.Rank() == 0:
+        # DC input, DC generators with zero amplitude would not affect the
+        # network
+        self.use_dc_input = bool(
+            self.stim_dict['dc_input'] and np.any(self.stim_dict['dc_amp']))
+
+        if self.rank == 0:
             message = ''
             if self.net_dict['N_scaling'] != 1:
                 message += \
@@ -313,7 +380,7 @@ class Network:
         if self.nest_version == '3':
             rng_seed = self.sim_dict['rng_seed']
 
-            if nest.Rank() == 0:
+            if self.rank == 0:
                 print('RNG seed: {} '.format(rng_seed))
                 print('  Total number of virtual processes: {}'.format(N_vp))
 
@@ -333,7 +400,7 @@ class Network:
             self.pyrngs = [np.random.RandomState(s) for s in list(range(
                 master_seed, master_seed + N_vp))]
 
-            if nest.Rank() == 0:
+            if self.rank == 0:
                 print('Master seed: {} '.format(master_seed))
                 print('  Total number of virtual processes: {}'.format(N_vp))
                 print('  Global random number generator seed: {}'.format(grng_seed))
@@ -366,116 +433,79 @@ class Network:
 
         The first and last neuron id of each population is written to file.
         """
-        if nest.Rank() == 0:
+        if self.rank == 0:
             print('Creating neuronal populations.')
 
+        neuron_params = self.net_dict['neuron_params']
+        base_params = {
+            'tau_syn_ex': neuron_params['tau_syn'],
+            'tau_syn_in': neuron_params['tau_syn'],
+            'E_L': neuron_params['E_L'],
+            'V_th': neuron_params['V_th'],
+            'V_reset': neuron_params['V_reset'],
+            't_ref': neuron_params['t_ref']}
+        V0_type = self.net_dict['V0_type']
+        if V0_type not in ('optimized', 'original'):
+            raise Exception(
+                'V0_type incorrect. ' +
+                'Valid options are "optimized" and "original".')
+        # 'original' uses the same distribution for all populations
+        V0_mean = np.broadcast_to(
+            neuron_params['V0_mean'][V0_type], self.num_pops)
+        V0_std = np.broadcast_to(
+            neuron_params['V0_std'][V0_type], self.num_pops)
+
+        # parameters shared by all populations are set once as model defaults
+        nest.SetDefaults(self.net_dict['neuron_model'], base_params)
+
         self.pops = []
-        for i in np.arange(self.num_pops):
+        for i in range(self.num_pops):
             population = nest.Create(self.net_dict['neuron_model'],
-                                     self.num_neurons[i])
+                                     self.num_neurons[i],
+                                     params={'I_e': float(self.DC_amp[i])})
 
             if self.nest_version == '3':
                 population.set(
-                    tau_syn_ex=self.net_dict['neuron_params']['tau_syn'],
-                    tau_syn_in=self.net_dict['neuron_params']['tau_syn'],
-                    E_L=self.net_dict['neuron_params']['E_L'],
-                    V_th=self.net_dict['neuron_params']['V_th'],
-                    V_reset=self.net_dict['neuron_params']['V_reset'],
-                    t_ref=self.net_dict['neuron_params']['t_ref'],
-                    I_e=self.DC_amp[i])
-            elif self.nest_version == '2':
-                nest.SetStatus(
-                    population, {
-                        'tau_syn_ex': self.net_dict['neuron_params']['tau_syn'],
-                        'tau_syn_in': self.net_dict['neuron_params']['tau_syn'],
-                        'E_L': self.net_dict['neuron_params']['E_L'],
-                        'V_th': self.net_dict['neuron_params']['V_th'],
-                        'V_reset': self.net_dict['neuron_params']['V_reset'],
-                        't_ref': self.net_dict['neuron_params']['t_ref'],
-                        'I_e': self.DC_amp[i]
-                    }
-                )
-            else:
-                raise Exception('NEST version unknown.')
-
-            if self.net_dict['V0_type'] == 'optimized':
-                if self.nest_version == '3':
-                    population.set(
-                        V_m=nest.random.normal(
-                            self.net_dict['neuron_params']['V0_mean']['optimized'][i],
-                            self.net_dict['neuron_params']['V0_std']['optimized'][i]))
-                elif self.nest_version == '2':
-                    for thread in np.arange(
-                            nest.GetKernelStatus('local_num_threads')):
-                        # Using GetNodes is a work-around until NEST 3.0 is
-                        # released. It will issue a deprecation warning.
-                        local_nodes = nest.GetNodes(
-                            [0], {
-                                'model': self.net_dict['neuron_model'],
-                                'thread': thread
-                            }, local_only=True
-                        )[0]
-                        vp = nest.GetStatus(local_nodes)[0]['vp']
-                        # vp is the same for all local nodes on the same thread
-                        local_pop = list(
-                            set(local_nodes).intersection(population))
-                        nest.SetStatus(
-                            local_pop, 'V_m', self.pyrngs[vp].normal(
-                                self.net_dict
-                                ['neuron_params']['V0_mean']['optimized'][i],
-                                self.net_dict
-                                ['neuron_params']['V0_std']['optimized'][i],
-                                len(local_pop))
-                        )
-                else:
-                    raise Exception('NEST version unknown.')
-
-            elif self.net_dict['V0_type'] == 'original':
-                if self.nest_version == '3':
-                    population.set(V_m=nest.random.normal(
-                        self.net_dict['neuron_params']['V0_mean']['original'],
-                        self.net_dict['neuron_params']['V0_std']['original']))
-                elif self.nest_version == '2':
-                    for thread in np.arange(
-                            nest.GetKernelStatus('local_num_threads')):
-                        local_nodes = nest.GetNodes(
-                            [0], {
-                                'model': self.net_dict['neuron_model'],
-                                'thread': thread
-                            }, local_only=True
-                        )[0]
-                        vp = nest.GetStatus(local_nodes)[0]['vp']
-                        local_pop = list(
-                            set(local_nodes).intersection(population))
-                        nest.SetStatus(
-                            local_pop,
-                            'V_m',
-                            self.pyrngs[vp].normal(
-                                self.net_dict['neuron_params']['V0_mean']['original'],
-                                self.net_dict['neuron_params']['V0_std']['original'],
-                                len(local_nodes)))
-                else:
-                    raise Exception('NEST version unknown.')
-
-            else:
-                raise Exception(
-                    'V0_type incorrect. ' +
-                    'Valid options are "optimized" and "original".')
+                    V_m=nest.random.normal(V0_mean[i], V0_std[i]))
 
             self.pops.append(population)
 
+        if self.nest_version == '2':
+            # NEST 2 only supports random distributions for synapse
+            # parameters, so the initial membrane potentials are drawn here
+            # with the random number generator of the virtual process a local
+            # neuron belongs to.
+            # Using GetNodes is a work-around until NEST 3.0 is released. It
+            # will issue a deprecation warning.
+            local_nodes = np.array(nest.GetNodes(
+                [0], {'model': self.net_dict['neuron_model']},
+                local_only=True)[0])
+            vps = np.array(nest.GetStatus(local_nodes.tolist(), 'vp'))
+            for i, population in enumerate(self.pops):
+                # local neurons of the population sorted by node id
+                local_pop, idx, _ = np.intersect1d(
+                    local_nodes, population, assume_unique=True,
+                    return_indices=True)
+                order = np.argsort(vps[idx], kind='stable')
+                local_pop = local_pop[order]
+                local_vps = vps[idx][order]
+                # split the local neurons into contiguous groups per vp
+                vp_ids, starts = np.unique(local_vps, return_index=True)
+                for vp, nodes in zip(vp_ids, np.split(local_pop, starts[1:])):
+                    V_m = self.pyrngs[vp].normal(V0_mean[i], V0_std[i],
+                                                 nodes.size)
+                    nest.SetStatus(nodes.tolist(), 'V_m', V_m.tolist())
+
         # write node ids to file
-        if nest.Rank() == 0:
-            fn = os.path.join(self.data_path, 'population_nodeids.dat')
-            with open(fn, 'w+') as f:
-                for pop in self.pops:
-                    if self.nest_version == '3':
-                        f.write('{} {}\n'.format(pop[0].global_id,
-                                                 pop[-1].global_id))
-                    elif self.nest_version == '2':
-                        f.write('{} {}\n'.format(pop[0], pop[-1]))
-                    else:
-                        raise Exception('NEST version unknown.')
+        if self.rank == 0:
+            if self.nest_version == '3':
+                lines = ['{} {}\n'.format(pop[0].global_id, pop[-1].global_id)
+                         for pop in self.pops]
+            else:
+                lines = ['{} {}\n'.format(pop[0], pop[-1])
+                         for pop in self.pops]
+            with open(self.nodeids_file, 'w+') as f:
+                f.writelines(lines)
 
     def __create_recording_devices(self):
         """ Creates one recording device of each kind per population.
@@ -483,18 +513,16 @@ class Network:
         Only devices which are given in ``sim_dict['rec_dev']`` are created.
 
         """
-        if nest.Rank() == 0:
+        if self.rank == 0:
             print('Creating recording devices.')
 
         if 'spike_recorder' in self.sim_dict['rec_dev']:
-            if nest.Rank() == 0:
+            if self.rank == 0:
                 print('  Creating spike recorders.')
             if self.nest_version == '3':
                 sd_dict = {
                     'record_to': 'ascii',
-                    'label': os.path.join(
-                        self.data_path,
-                        'spike_recorder')}
+                    'label': self.spike_recorder_label}
                 self.spike_recorders = nest.Create('spike_recorder',
                                                    n=self.num_pops,
                                                    params=sd_dict)
@@ -504,7 +532,7 @@ class Network:
                     'withtime': True,
                     'to_memory': False,
                     'to_file': True,
-                    'label': os.path.join(self.data_path, 'spike_recorder')
+                    'label': self.spike_recorder_label
                 }
                 self.spike_recorders = nest.Create('spike_detector',
                                                    n=self.num_pops,
@@ -514,7 +542,7 @@ class Network:
                 raise Exception('NEST version unknown.')
 
         if 'voltmeter' in self.sim_dict['rec_dev']:
-            if nest.Rank() == 0:
+            if self.rank == 0:
                 print('  Creating voltmeters.')
 
             if self.nest_version == '3':
@@ -522,14 +550,14 @@ class Network:
                     'interval': self.sim_dict['rec_V_int'],
                     'record_to': 'ascii',
                     'record_from': ['V_m'],
-                    'label': os.path.join(self.data_path, 'voltmeter')}
+                    'label': self.voltmeter_label}
             elif self.nest_version == '2':
                 vm_dict = {
                     'withgid': True,
                     'withtime': True,
                     'to_memory': False,
                     'to_file': True,
-                    'label': os.path.join(self.data_path, 'voltmeter')}
+                    'label': self.voltmeter_label}
             else:
                 raise Exception('NEST version unknown.')
 
@@ -545,7 +573,7 @@ class Network:
         in ``create_neuronal_populations()``.
 
         """
-        if nest.Rank() == 0:
+        if self.rank == 0:
             print('Creating Poisson generators for background input.')
 
         self.poisson_bg_input = nest.Create('poisson_generator',
@@ -555,8 +583,8 @@ class Network:
                 self.net_dict['bg_rate'] * self.ext_indegrees
         elif self.nest_version == '2':
             rate = self.net_dict['bg_rate'] * self.ext_indegrees
-            for i, r in enumerate(rate):
-                nest.SetStatus([self.poisson_bg_input[i]], {'rate': r})
+            nest.SetStatus(self.poisson_bg_input,
+                           [{'rate': float(r)} for r in rate])
         else:
             raise Exception('NEST version unknown.')
 
@@ -570,7 +598,7 @@ class Network:
         ``N_scaling``.
 
         """
-        if nest.Rank() == 0:
+        if self.rank == 0:
             print('Creating thalamic input for external stimulation.')
 
         self.thalamic_population = nest.Create(
@@ -605,196 +633,164 @@ class Network:
         """
         dc_amp_stim = self.stim_dict['dc_amp'] * self.net_dict['K_ext']
 
-        if nest.Rank() == 0:
+        if self.rank == 0:
             print('Creating DC generators for external stimulation.')
 
+        dc_dict = {'start': self.stim_dict['dc_start'],
+                   'stop': (self.stim_dict['dc_start'] +
+                            self.stim_dict['dc_dur'])}
         if self.nest_version == '3':
-            dc_dict = {'amplitude': dc_amp_stim,
-                       'start': self.stim_dict['dc_start'],
-                       'stop': (self.stim_dict['dc_start'] +
-                                self.stim_dict['dc_dur'])}
-            self.dc_stim_input = nest.Create('dc_generator', n=self.num_pops,
-                                             params=dc_dict)
+            self.dc_stim_input = nest.Create(
+                'dc_generator', n=self.num_pops,
+                params={**dc_dict, 'amplitude': dc_amp_stim})
         elif self.nest_version == '2':
-            dc_dict = {'start': self.stim_dict['dc_start'],
-                       'stop': (self.stim_dict['dc_start'] +
-                                self.stim_dict['dc_dur'])}
-            self.dc_stim_input = []
-            for amp in dc_amp_stim:
-                dc_dict.update({'amplitude': amp})
-                dc = nest.Create('dc_generator', n=self.num_pops,
-                                 params=dc_dict)
-                self.dc_stim_input.append(dc)
+            self.dc_stim_input = nest.Create(
+                'dc_generator', n=self.num_pops,
+                params=[{**dc_dict, 'amplitude': float(amp)}
+                        for amp in dc_amp_stim])
         else:
             raise Exception('NEST version unknown.')
 
     def __connect_neuronal_populations(self):
         """ Creates the recurrent connections between neuronal populations. """
-        if nest.Rank() == 0:
+        if self.rank == 0:
             print('Connecting neuronal populations recurrently.')
 
-        for i, target_pop in enumerate(self.pops):
-            for j, source_pop in enumerate(self.pops):
-                if self.num_synapses[i][j] >= 0.:
-                    conn_dict_rec = {
-                        'rule': 'fixed_total_number',
-                        'N': self.num_synapses[i][j]}
-
-                    if self.nest_version == '3':
-                        if self.weight_matrix_mean[i][j] < 0:
-                            w_min = -np.inf
-                            w_max = 0.0
-                        else:
-                            w_min = 0.0
-                            w_max = np.inf
-
-                        syn_dict = {
-                            'synapse_model': self.net_dict['synapse_type'],
-                            'weight': nest.math.redraw(
-                                nest.random.normal(
-                                    mean=self.weight_matrix_mean[i][j],
-                                    std=abs(
-                                        self.weight_matrix_mean[i][j] *
-                                        self.net_dict['weight_rel_std'])),
-                                min=w_min,
-                                max=w_max),
-                            'delay': nest.math.redraw(
-                                nest.random.normal(
-                                    mean=self.net_dict['delay_matrix_mean'][i][j],
-                                    std=(
-                                        self.net_dict['delay_matrix_mean'][i][j] *
-                                        self.net_dict['delay_rel_std'])),
-                                min=self.sim_resolution,
-                                max=np.inf)}
-                    elif self.nest_version == '2':
-                        syn_dict = {
-                            'model': self.net_dict['synapse_type'],
-                            'weight': {
-                                'distribution': 'normal_clipped',
-                                'mu': self.weight_matrix_mean[i][j],
-                                'sigma': abs(
-                                    self.weight_matrix_mean[i][j] *
-                                    self.net_dict['weight_rel_std']),
-                            },
-                            'delay': {
-                                'distribution': 'normal_clipped',
-                                'mu': self.net_dict['delay_matrix_mean'][i][j],
-                                'sigma': (
-                                    self.net_dict['delay_matrix_mean'][i][j] *
-                                    self.net_dict['delay_rel_std']),
-                                'low': self.sim_resolution}}
-                        if self.weight_matrix_mean[i][j] < 0:
-                            syn_dict['weight']['high'] = 0.0
-                        else:
-                            syn_dict['weight']['low'] = 0.0
-                    else:
-                        raise Exception('NEST version unknown.')
-
-                    nest.Connect(
-                        source_pop, target_pop,
-                        conn_spec=conn_dict_rec,
-                        syn_spec=syn_dict)
+        # inhibitory weights are clipped from above, excitatory ones from below
+        w_mean = self.weight_matrix_mean
+        w_std = self.weight_matrix_std
+        d_mean = self.delay_matrix_mean
+        d_std = self.delay_matrix_std
+        inhibitory = w_mean < 0
+
+        if self.nest_version == '3':
+            syn_dicts = [[{
+                'synapse_model': self.net_dict['synapse_type'],
+                'weight': _normal_clipped(
+                    w_mean[i][j], w_std[i][j],
+                    -np.inf if inhibitory[i][j] else 0.0,
+                    0.0 if inhibitory[i][j] else np.inf),
+                'delay': _normal_clipped(
+                    d_mean[i][j], d_std[i][j], self.sim_resolution, np.inf)}
+                for j in range(self.num_pops)] for i in range(self.num_pops)]
+        elif self.nest_version == '2':
+            syn_dicts = [[{
+                'model': self.net_dict['synapse_type'],
+                'weight': {
+                    'distribution': 'normal_clipped',
+                    'mu': w_mean[i][j],
+                    'sigma': w_std[i][j],
+                    'high' if inhibitory[i][j] else 'low': 0.0},
+                'delay': {
+                    'distribution': 'normal_clipped',
+                    'mu': d_mean[i][j],
+                    'sigma': d_std[i][j],
+                    'low': self.sim_resolution}}
+                for j in range(self.num_pops)] for i in range(self.num_pops)]
+        else:
+            raise Exception('NEST version unknown.')
+
+        for i, j, N in zip(self.syn_i, self.syn_j, self.syn_N):
+            conn_dict_rec = {
+                'rule': 'fixed_total_number',
+                'N': N}
+            nest.Connect(
+                self.pops[j], self.pops[i],
+                conn_spec=conn_dict_rec,
+                syn_spec=syn_dicts[i][j])
 
     def __connect_recording_devices(self):
         """ Connects the recording devices to the microcircuit."""
-        if nest.Rank == 0:
+        if self.rank == 0:
             print('Connecting recording devices.')
 
-        for i, target_pop in enumerate(self.pops):
-            if 'spike_recorder' in self.sim_dict['rec_dev']:
-                if self.nest_version == '3':
-                    nest.Connect(target_pop, self.spike_recorders[i])
-                elif self.nest_version == '2':
-                    nest.Connect(target_pop, [self.spike_recorders[i]])
-                else:
-                    raise Exception('NEST version unknown.')
-            if 'voltmeter' in self.sim_dict['rec_dev']:
-                if self.nest_version == '3':
-                    nest.Connect(self.voltmeters[i], target_pop)
-                elif self.nest_version == '2':
-                    nest.Connect([self.voltmeters[i]], target_pop)
-                else:
-                    raise Exception('NEST version unknown.')
+        if 'spike_recorder' in self.sim_dict['rec_dev']:
+            if self.nest_version == '3':
+                spike_recorders = self.spike_recorders
+            elif self.nest_version == '2':
+                spike_recorders = [[sr] for sr in self.spike_recorders]
+            else:
+                raise Exception('NEST version unknown.')
+            for target_pop, spike_recorder in zip(self.pops, spike_recorders):
+                nest.Connect(target_pop, spike_recorder)
+
+        if 'voltmeter' in self.sim_dict['rec_dev']:
+            if self.nest_version == '3':
+                voltmeters = self.voltmeters
+            elif self.nest_version == '2':
+                voltmeters = [[vm] for vm in self.voltmeters]
+            else:
+                raise Exception('NEST version unknown.')
+            for target_pop, voltmeter in zip(self.pops, voltmeters):
+                nest.Connect(voltmeter, target_pop)
 
     def __connect_poisson_bg_input(self):
         """ Connects the Poisson generators to the microcircuit."""
-        if nest.Rank() == 0:
+        if self.rank == 0:
             print('Connecting Poisson generators for background input.')
 
-        for i, target_pop in enumerate(self.pops):
-            conn_dict_poisson = {'rule': 'all_to_all'}
+        # all populations receive background input with the same parameters
+        conn_dict_poisson = {'rule': 'all_to_all'}
+        if self.nest_version == '3':
+            syn_dict_poisson = {
+                'synapse_model': self.net_dict['synapse_type'],
+                'weight': self.weight_ext,
+                'delay': self.net_dict['delay_poisson']}
+            sources = self.poisson_bg_input
+        elif self.nest_version == '2':
+            syn_dict_poisson = {
+                'model': self.net_dict['synapse_type'],
+                'weight': self.weight_ext,
+                'delay': self.net_dict['delay_poisson']}
+            sources = [[pg] for pg in self.poisson_bg_input]
+        else:
+            raise Exception('NEST version unknown.')
 
-            if self.nest_version == '3':
-                syn_dict_poisson = {
-                    'synapse_model': self.net_dict['synapse_type'],
-                    'weight': self.weight_ext,
-                    'delay': self.net_dict['delay_poisson']}
-                nest.Connect(
-                    self.poisson_bg_input[i], target_pop,
-                    conn_spec=conn_dict_poisson,
-                    syn_spec=syn_dict_poisson)
-            elif self.nest_version == '2':
-                syn_dict_poisson = {
-                    'model': self.net_dict['synapse_type'],
-                    'weight': self.weight_ext,
-                    'delay': self.net_dict['delay_poisson']}
-                nest.Connect(
-                    [self.poisson_bg_input[i]], target_pop,
-                    conn_spec=conn_dict_poisson,
-                    syn_spec=syn_dict_poisson)
-            else:
-                raise Exception('NEST version unknown.')
+        for source, target_pop in zip(sources, self.pops):
+            nest.Connect(
+                source, target_pop,
+                conn_spec=conn_dict_poisson,
+                syn_spec=syn_dict_poisson)
 
     def __connect_thalamic_stim_input(self):
         """ Connects the thalamic input to the neuronal populations."""
-        if nest.Rank() == 0:
+        if self.rank == 0:
             print('Connecting thalamic input.')
 
         # connect Poisson input to thalamic population
         nest.Connect(self.poisson_th, self.thalamic_population)
 
-        # connect thalamic population to neuronal populations
-        for i, target_pop in enumerate(self.pops):
-            conn_dict_th = {
-                'rule': 'fixed_total_number',
-                'N': self.num_th_synapses[i]}
+        # the synapse parameters are the same for all target populations
+        weight_th_std = self.weight_th * self.net_dict['weight_rel_std']
+        delay_th_mean = self.stim_dict['delay_th_mean']
+        delay_th_std = delay_th_mean * self.stim_dict['delay_th_rel_std']
+        if self.nest_version == '3':
+            syn_dict_th = {
+                'weight': _normal_clipped(
+                    self.weight_th, weight_th_std, 0.0, np.inf),
+                'delay': _normal_clipped(
+                    delay_th_mean, delay_th_std, self.sim_resolution, np.inf)}
 
-            if self.nest_version == '3':
-                syn_dict_th = {
-                    'weight': nest.math.redraw(
-                        nest.random.normal(
-                            mean=self.weight_th,
-                            std=self.weight_th *
-                            self.net_dict['weight_rel_std']),
-                        min=0.0,
-                        max=np.inf),
-                    'delay': nest.math.redraw(
-                        nest.random.normal(
-                            mean=self.stim_dict['delay_th_mean'],
-                            std=(
-                                self.stim_dict['delay_th_mean'] *
-                                self.stim_dict['delay_th_rel_std'])),
-                        min=self.sim_resolution,
-                        max=np.inf)}
+        elif self.nest_version == '2':
+            syn_dict_th = {
+                'weight': {
+                    'distribution': 'normal_clipped',
+                    'mu': self.weight_th,
+                    'sigma': weight_th_std,
+                    'low': 0.0},
+                'delay': {
+                    'distribution': 'normal_clipped',
+                    'mu': delay_th_mean,
+                    'sigma': delay_th_std,
+                    'low': self.sim_resolution}}
+        else:
+            raise Exception('NEST version unknown.')
 
-            elif self.nest_version == '2':
-                syn_dict_th = {
-                    'weight': {
-                        'distribution': 'normal_clipped',
-                        'mu': self.weight_th,
-                        'sigma': self.weight_th *
-                        self.net_dict['weight_rel_std'],
-                        'low': 0.0},
-                    'delay': {
-                        'distribution': 'normal_clipped',
-                        'mu': self.stim_dict['delay_th_mean'],
-                        'sigma': (
-                            self.stim_dict['delay_th_mean'] *
-                            self.stim_dict['delay_th_rel_std']),
-                        'low': self.sim_resolution}}
-            else:
-                raise Exception('NEST version unknown.')
+        conn_dicts_th = [{'rule': 'fixed_total_number', 'N': int(N)}
+                         for N in self.num_th_synapses]
 
+        # connect thalamic population to neuronal populations
+        for conn_dict_th, target_pop in zip(conn_dicts_th, self.pops):
             nest.Connect(
                 self.thalamic_population, target_pop,
                 conn_spec=conn_dict_th, syn_spec=syn_dict_th)
@@ -802,8 +798,15 @@ class Network:
     def __connect_dc_stim_input(self):
         """ Connects the DC generators to the neuronal populations. """
 
-        if nest.Rank() == 0:
+        if self.rank == 0:
             print('Connecting DC generators.')
 
-        for i, target_pop in enumerate(self.pops):
-            nest.Connect(self.dc_stim_input[i], target_pop)
+        if self.nest_version == '3':
+            sources = self.dc_stim_input
+        elif self.nest_version == '2':
+            sources = [[dc] for dc in self.dc_stim_input]
+        else:
+            raise Exception('NEST version unknown.')
+
+        for source, target_pop in zip(sources, self.pops):
+            nest.Connect(source, target_pop)